@@ -1,4 +1,46 @@
-from search import search_prompt
+import threading
+from concurrent.futures import Future, wait
+
+try:
+    import readline  # noqa: F401  # habilita histórico e edição de linha no input()
+except ImportError:  # indisponível no Windows
+    pass
+
+EXIT_COMMANDS = frozenset(("fechar", "exit", "close"))
+MAX_EXIT_COMMAND_LENGTH = max(map(len, EXIT_COMMANDS))
+BATCH_START = "<<EOF"
+BATCH_END = "EOF"
+
+
+def read_batch() -> list:
+    """Lê perguntas, uma por linha, até a linha BATCH_END, ignorando linhas vazias."""
+    questions = []
+    while (line := input("... ").strip()) != BATCH_END:
+        if line:
+            questions.append(line)
+    return questions
+
+
+def start_warmup(build) -> Future:
+    """
+    Constrói a cadeia RAG em uma thread de fundo enquanto o usuário digita a primeira pergunta.
+
+    Args:
+        build (Callable): Função que constrói (e mantém em cache) a cadeia RAG.
+
+    Returns:
+        Future: Concluído quando a cadeia estiver pronta ou a construção falhar.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(build())
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
 
 
 def print_welcome_message():    
@@ -7,18 +49,48 @@ def print_welcome_message():
     print("Powered by OpenApi + LangChain + pgVector")
     print("=" * 60)
     print("Digite 'fechar', 'exit' ou 'close' para encerrar.")
+    print(f"Para várias perguntas de uma vez, digite '{BATCH_START}', uma pergunta por linha e '{BATCH_END}'.")
 
 def main():
     print_welcome_message();
+    # Importado após o banner para que o chat apareça antes do carregamento de LangChain e afins.
+    from search import build_rag_chain, search_prompt, search_prompts
+    warmup = start_warmup(build_rag_chain)
 
     while True:
-            mensagem = input("Você: ").strip().lower()  # remove espaços e transforma em minúsculas
-            if mensagem in ("fechar", "exit", "close"):
+            mensagem = input("Você: ").strip()  # remove espaços; perguntas seguem sem normalização
+            # Só entradas curtas podem ser comandos de saída, então perguntas longas não são convertidas.
+            if len(mensagem) <= MAX_EXIT_COMMAND_LENGTH and mensagem.lower() in EXIT_COMMANDS:
                 print("👋 Chat encerrado. Até mais!")
                 break
+            elif mensagem == BATCH_START:
+                questions = read_batch()
+                wait([warmup])
+                for question, message in zip(questions, search_prompts(questions)):
+                    print(f"Pergunta: {question}")
+                    print(f"Bot: {message}")
             else:
-                message = search_prompt(mensagem)
-                print(f"Bot: '{message}'")
+                # Aguarda o aquecimento; search_prompt reutiliza a cadeia em cache ou, se a
+                # construção falhou, tenta novamente e registra o erro.
+                wait([warmup])
+                streamed = []
+
+                def on_token(token):
+                    # O prefixo só sai com o primeiro trecho, depois dos logs da recuperação.
+                    if not streamed:
+                        print("Bot: ", end="", flush=True)
+                    streamed.append(token)
+                    print(token, end="", flush=True)
+
+                message = search_prompt(mensagem, on_token=on_token)
+                # Respostas que não vêm do LLM (ex.: sem contexto ou erro) não são transmitidas.
+                if not streamed:
+                    print(f"Bot: {message}")
+                elif message != "".join(streamed).strip():
+                    # O streaming falhou no meio: o trecho exibido está incompleto.
+                    print(f"\n[Resposta interrompida] Bot: {message}")
+                else:
+                    print()
         # chain = search_prompt()
 
         # if not chain:
@@ -0,0 +1,26 @@
+from functools import lru_cache
+import httpx
+from langchain_openai import OpenAIEmbeddings
+
+REQUEST_TIMEOUT = 30
+
+# Pool HTTP único (keep-alive) compartilhado por ingestão e recuperação,
+# evitando novos handshakes TCP/TLS com a OpenAI a cada cliente criado.
+_http_client = httpx.Client(
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+)
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(model: str = "text-embedding-3-small") -> OpenAIEmbeddings:
+    """
+    Retorna o cliente de embeddings da OpenAI compartilhado para o modelo informado.
+
+    Args:
+        model (str): Modelo de embedding OpenAI (padrão: text-embedding-3-small).
+
+    Returns:
+        OpenAIEmbeddings: Instância reutilizada entre chamadas, usando o pool HTTP compartilhado.
+    """
+    # O timeout precisa ir em request_timeout: o SDK da OpenAI ignora o do httpx.Client.
+    return OpenAIEmbeddings(model=model, http_client=_http_client, request_timeout=REQUEST_TIMEOUT)
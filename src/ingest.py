@@ -1,14 +1,31 @@
+import hashlib
+import json
 import os
+import re
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import psycopg
 from dotenv import load_dotenv
 from loguru import logger
+from pgvector.psycopg import register_vector
+from psycopg.types.json import Jsonb
 from langchain_postgres import PGVector
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
+from embeddings import get_embeddings
 
 load_dotenv()
 REQUIRED_ENV_VARS = ["PDF_PATH", "DATABASE_URL", "PG_VECTOR_COLLECTION_NAME"]
+SPLITTER_ENCODING = "cl100k_base"  # tokenizer of the OpenAI text-embedding-3 models
+SPLITTER_CHUNK_TOKENS = 512
+SPLITTER_CHUNK_OVERLAP_TOKENS = 64
+COPY_EMBEDDINGS_SQL = (
+    "COPY langchain_pg_embedding (id, collection_id, embedding, document, cmetadata) "
+    "FROM STDIN (FORMAT BINARY)"
+)
+COPY_EMBEDDINGS_TYPES = ["varchar", "uuid", "halfvec", "varchar", "jsonb"]
+VECTOR_INDEX_NAME = "langchain_pg_embedding_embedding_idx"
 
 
 def validate_env():
@@ -31,59 +48,223 @@ def validate_env():
     logger.info("Environment variables validated successfully.")
 
 
-def load_and_split_pdf(pdf_path: str):
+def load_and_split_pdf(pdf_path: str) -> Iterator[Tuple[str, Dict]]:
     """
-    Loads a PDF and splits its content into text chunks.
+    Lazily loads a PDF and splits its content into text chunks.
 
-    Uses PyPDFLoader to read the PDF and RecursiveCharacterTextSplitter to split text into chunks.
-    Enriches chunks with filtered metadata.
+    Uses PyPDFLoader.lazy_load to read one page at a time and RecursiveCharacterTextSplitter to
+    split each page as soon as it is read, so chunks are produced incrementally and memory stays
+    bounded by a single page instead of the whole PDF. Chunk sizes are measured in tokens of the
+    embedding model's encoding rather than characters. Enriches chunks with filtered metadata.
 
     Args:
         pdf_path (str): Path to the PDF file.
 
-    Returns:
-        list: List of Document objects containing split text chunks.
+    Yields:
+        tuple: (text, metadata) pairs for each split text chunk.
 
     Raises:
         ValueError: If no pages are found or no text chunks are created from the PDF.
     """
-    logger.info(f"Loading PDF from path: {pdf_path}")
+    logger.info(f"Streaming PDF from path: {pdf_path}")
     loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
-    logger.info(f"Loaded {len(docs)} pages from PDF.")
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=SPLITTER_ENCODING,
+        chunk_size=SPLITTER_CHUNK_TOKENS,
+        chunk_overlap=SPLITTER_CHUNK_OVERLAP_TOKENS,
+        add_start_index=False,
+    )
 
-    if not docs:
-        raise ValueError(f"No pages found in PDF: {pdf_path}")
+    pages = chunks = 0
+    for page in loader.lazy_load():
+        pages += 1
+        for d in splitter.split_documents([page]):
+            chunks += 1
+            yield d.page_content, {k: v for k, v in d.metadata.items() if v not in ("", None)}
+    logger.info(f"Split {pages} pages from PDF into {chunks} text chunks.")
 
-    logger.info("Splitting PDF content into text chunks...")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150, add_start_index=False)
-    splits = splitter.split_documents(docs)
-    logger.info(f"Split PDF into {len(splits)} text chunks.")
+    if not pages:
+        raise ValueError(f"No pages found in PDF: {pdf_path}")
 
-    if not splits:
+    if not chunks:
         raise ValueError("No text chunks were created from the PDF.")
 
-    logger.info("Enriching chunks with filtered metadata...")
-    enriched = [
-        Document(
-            page_content=d.page_content,
-            metadata={k: v for k, v in d.metadata.items() if v not in ("", None)}
+
+def to_psycopg_url(db_url: str) -> str:
+    """
+    Converts a SQLAlchemy database URL into a libpq URL accepted by psycopg.
+
+    Args:
+        db_url (str): Database URL, optionally with a driver suffix (e.g. postgresql+psycopg://).
+
+    Returns:
+        str: The same URL using the plain postgresql:// scheme.
+    """
+    return re.sub(r"^postgresql\+\w+://", "postgresql://", db_url)
+
+
+def content_id(model_name: str, collection_name: str, text: str, metadata: Dict) -> str:
+    """
+    Builds a deterministic chunk ID from everything that determines its stored row.
+
+    The embedding model is hashed so that switching models re-embeds every chunk instead of
+    comparing queries against vectors from another model. The metadata is hashed so that text
+    moving to another page is stored with its new page. The collection name is hashed because
+    IDs are unique across the whole langchain_pg_embedding table, which is shared by every
+    collection.
+
+    Args:
+        model_name (str): Embedding model used for the chunk.
+        collection_name (str): Target PGVector collection name.
+        text (str): Chunk text.
+        metadata (dict): Chunk metadata.
+
+    Returns:
+        str: 32-character BLAKE2b hex digest.
+    """
+    payload = f"{model_name}\0{collection_name}\0{text}\0{json.dumps(metadata, sort_keys=True, default=str)}"
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def take_columns(
+    chunks: Iterator[Tuple[str, Dict]], size: int, model_name: str, collection_name: str
+) -> Tuple[List[str], List[Dict], List[str]]:
+    """
+    Takes up to `size` chunks and lays them out as parallel arrays in a single pass.
+
+    Args:
+        chunks (Iterator[tuple]): Iterator of (text, metadata) pairs.
+        size (int): Maximum number of chunks to take.
+        model_name (str): Embedding model name, used to generate content IDs.
+        collection_name (str): Target PGVector collection name, used to generate content IDs.
+
+    Returns:
+        tuple: (texts, metadatas, ids) lists of equal length; empty when the iterator is exhausted.
+    """
+    texts, metadatas, ids = [], [], []
+    for text, metadata in islice(chunks, size):
+        texts.append(text)
+        metadatas.append(metadata)
+        ids.append(content_id(model_name, collection_name, text, metadata))
+    return texts, metadatas, ids
+
+
+def check_embedding_dimensions(conn, collection_id, dimensions: int):
+    """
+    Ensures no other collection stores embeddings with different dimensions.
+
+    langchain_pg_embedding is shared by every collection, so the halfvec(dimensions) column
+    type set by ensure_halfvec_column must fit the rows of all of them.
+
+    Args:
+        conn (psycopg.Connection): Open database connection.
+        collection_id (uuid.UUID): ID of the collection being ingested.
+        dimensions (int): Number of embedding dimensions of the collection being ingested.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If another collection has embeddings with different dimensions.
+    """
+    row = conn.execute(
+        "SELECT c.name, vector_dims(e.embedding) FROM langchain_pg_embedding e "
+        "JOIN langchain_pg_collection c ON c.uuid = e.collection_id "
+        "WHERE e.collection_id <> %s AND vector_dims(e.embedding) <> %s LIMIT 1",
+        (collection_id, dimensions),
+    ).fetchone()
+    if row:
+        raise ValueError(
+            f"Collection '{row[0]}' stores {row[1]}-dimensional embeddings, but this ingestion produces "
+            f"{dimensions} dimensions; the shared embedding column cannot hold both as halfvec({dimensions})."
         )
-        for d in splits
-    ]
-    logger.info("Document enrichment completed.")
 
-    return enriched
+
+def delete_mismatched_embeddings(conn, collection_id, dimensions: int) -> int:
+    """
+    Deletes rows of the collection whose embeddings have different dimensions.
+
+    Such rows come from a previous embedding model. Chunk IDs hash the model, so they are stale
+    for this run anyway, and they would make the halfvec(dimensions) cast in
+    ensure_halfvec_column fail. They are deleted before the HNSW index is dropped.
+
+    Args:
+        conn (psycopg.Connection): Open autocommit database connection.
+        collection_id (uuid.UUID): ID of the collection being ingested.
+        dimensions (int): Number of embedding dimensions of the collection being ingested.
+
+    Returns:
+        int: Number of deleted rows.
+    """
+    deleted = conn.execute(
+        "DELETE FROM langchain_pg_embedding WHERE collection_id = %s AND vector_dims(embedding) <> %s",
+        (collection_id, dimensions),
+    ).rowcount
+    if deleted:
+        logger.info(f"Deleted {deleted} embeddings of this collection with dimensions other than {dimensions}.")
+    return deleted
 
 
-def store_documents(docs):
+def ensure_halfvec_column(db_url: str, dimensions: int):
     """
-    Stores Document objects in a PGVector collection after embedding.
+    Converts the embedding column to halfvec with fixed dimensions, if it is not already.
 
-    Uses OpenAIEmbeddings to convert documents into embeddings and stores them using PGVector.
+    halfvec stores each dimension as fp16, halving row size, index size and the memory read during
+    HNSW traversal with negligible recall loss. Fixed dimensions are also required by HNSW, and
+    LangChain creates the column as an unconstrained vector. Existing rows are cast in place, so
+    callers must run check_embedding_dimensions and delete_mismatched_embeddings and drop the
+    HNSW index first, as done by store_documents.
+
+    Runs on its own autocommit connection so the table lock is held only for the conversion.
 
     Args:
-        docs (list): List of Document objects to store.
+        db_url (str): Database URL.
+        dimensions (int): Number of embedding dimensions.
+
+    Returns:
+        None
+    """
+    with psycopg.connect(to_psycopg_url(db_url), autocommit=True) as conn:
+        column_type = conn.execute(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'"
+        ).fetchone()[0]
+        if column_type != f"halfvec({dimensions})":
+            logger.info(f"Converting embedding column from {column_type} to halfvec({dimensions})...")
+            conn.execute(
+                f"ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding "
+                f"TYPE halfvec({dimensions}) USING embedding::halfvec({dimensions})"
+            )
+
+
+def store_documents(docs, batch_size: int = 256):
+    """
+    Stores text chunks in a PGVector collection after embedding.
+
+    Embeds documents in batches with a single OpenAIEmbeddings request per batch and streams
+    the precomputed vectors into langchain_pg_embedding with a binary COPY, so ingestion costs
+    ceil(N / batch_size) round-trips and avoids per-row INSERT overhead. PGVector is still
+    initialized first so the extension, tables and collection exist before copying.
+
+    Chunks are consumed lazily, so embedding and storing overlap with PDF loading, and each
+    batch is laid out as parallel texts/metadatas/ids arrays fed directly to the embedder and COPY.
+
+    Embeddings are stored as fp16 halfvec (see ensure_halfvec_column).
+
+    Chunk IDs hash the embedding model, text and metadata, so chunks already stored by a previous
+    run are skipped and re-ingesting an unchanged PDF with the same model costs no embedding calls.
+    Rows of the collection that the current PDF no longer produces are deleted in the same
+    transaction; rows embedded with different dimensions are deleted up front, before the column
+    is converted (see delete_mismatched_embeddings).
+
+    The HNSW index is dropped just before the first COPY that has new rows and rebuilt afterwards,
+    even on failure, so a rerun with nothing new keeps the index in place. Existence checks run on
+    a separate autocommit connection, so the COPY transaction holds no lock on the table when the
+    index is dropped.
+
+    Args:
+        docs (Iterable[tuple]): (text, metadata) pairs to store.
+        batch_size (int): Number of documents embedded and inserted per round-trip (default: 256).
 
     Returns:
         None
@@ -91,26 +272,152 @@ def store_documents(docs):
     Logs progress, number of stored documents, and success message.
     """
     logger.info("Initializing embedding and database storage pipeline...")
-    model_name = os.getenv("OPENAI_MODEL", "text-embedding-3-small")
+    model_name = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
     collection_name = os.getenv("PG_VECTOR_COLLECTION_NAME")
     db_url = os.getenv("DATABASE_URL")
 
     logger.info(f"Using OpenAI embedding model: {model_name}")
     logger.info(f"Target PGVector collection: {collection_name}")
 
-    embeddings = OpenAIEmbeddings(model=model_name)
-    store = PGVector(
+    embeddings = get_embeddings(model_name)
+    # Instantiating PGVector creates the vector extension, tables and collection if missing.
+    PGVector(
         embeddings=embeddings,
         collection_name=collection_name,
         connection=db_url,
         use_jsonb=True,
     )
 
-    ids = [f"doc-{i}" for i in range(len(docs))]
-    logger.info(f"Preparing to store {len(docs)} documents with generated IDs...")
+    logger.info(f"Storing documents with content-hash IDs in batches of {batch_size}...")
+
+    docs = iter(docs)
+    stored = skipped = removed = 0
+    produced_ids = set()
+    index_dropped = False
+    try:
+        with psycopg.connect(to_psycopg_url(db_url)) as conn, \
+                psycopg.connect(to_psycopg_url(db_url), autocommit=True) as lookup:
+            register_vector(conn)
+            collection_id = lookup.execute(
+                "SELECT uuid FROM langchain_pg_collection WHERE name = %s", (collection_name,)
+            ).fetchone()[0]
+
+            while True:
+                texts, metadatas, ids = take_columns(docs, batch_size, model_name, collection_name)
+                if not texts:
+                    break
+
+                # COPY has no ON CONFLICT clause, so drop chunks that are already stored and chunks
+                # already produced by this run (earlier batches or repeats within the batch).
+                existing = {
+                    row[0] for row in lookup.execute("SELECT id FROM langchain_pg_embedding WHERE id = ANY(%s)", (ids,))
+                }
+                new = {}
+                for i, doc_id in enumerate(ids):
+                    if doc_id not in existing and doc_id not in produced_ids:
+                        new.setdefault(doc_id, i)
+                produced_ids.update(ids)
+                skipped += len(ids) - len(new)
+                if not new:
+                    continue
+
+                keep = list(new.values())
+                texts = [texts[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                ids = list(new)
+
+                # One C-level conversion per batch; rows are big-endian float16 views that the
+                # pgvector halfvec binary dumper writes as-is instead of converting each float in Python.
+                vectors = np.asarray(embeddings.embed_documents(texts), dtype=">f2")
+                if not index_dropped:
+                    check_embedding_dimensions(lookup, collection_id, vectors.shape[1])
+                    removed += delete_mismatched_embeddings(lookup, collection_id, vectors.shape[1])
+                    drop_vector_index(db_url)
+                    index_dropped = True
+                    ensure_halfvec_column(db_url, vectors.shape[1])
+                with conn.cursor().copy(COPY_EMBEDDINGS_SQL) as copy:
+                    copy.set_types(COPY_EMBEDDINGS_TYPES)
+                    for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                        copy.write_row((doc_id, collection_id, vector, text, Jsonb(metadata)))
+                stored += len(texts)
+                logger.info(f"Stored {stored} documents so far ({skipped} unchanged skipped).")
+
+            # Rows the current PDF no longer produces (edited chunks, older splits) would otherwise
+            # be retrieved alongside the current ones.
+            removed += conn.execute(
+                "DELETE FROM langchain_pg_embedding WHERE collection_id = %s AND NOT (id = ANY(%s))",
+                (collection_id, list(produced_ids)),
+            ).rowcount
+    finally:
+        # Runs after the COPY transaction has been committed or rolled back, so the index build
+        # does not wait on its locks.
+        if index_dropped:
+            create_vector_index(db_url)
+
+    logger.info(
+        f"Successfully ingested {stored} new documents into PGVector collection '{collection_name}' "
+        f"({skipped} unchanged skipped, {removed} stale removed)."
+    )
+
+
+def drop_vector_index(db_url: str):
+    """
+    Drops the HNSW index on langchain_pg_embedding before a bulk load.
+
+    Inserting into a table with an HNSW index pays graph maintenance per row, which is much
+    slower than building the index once after the data is in place.
+
+    Args:
+        db_url (str): Database URL.
+
+    Returns:
+        None
+    """
+    logger.info(f"Dropping vector index '{VECTOR_INDEX_NAME}' before bulk ingestion...")
+    with psycopg.connect(to_psycopg_url(db_url), autocommit=True) as conn:
+        conn.execute(f"DROP INDEX IF EXISTS {VECTOR_INDEX_NAME}")
 
-    store.add_documents(documents=docs, ids=ids)
-    logger.info(f"Successfully ingested {len(docs)} documents into PGVector collection '{collection_name}'.")
+
+def create_vector_index(db_url: str):
+    """
+    Builds the HNSW cosine index on langchain_pg_embedding after a bulk load.
+
+    The index is built over the halfvec column converted by ensure_halfvec_column. If the column
+    was never converted (the conversion failed or never ran), the build is skipped with an error log
+    instead of raising, since this runs from store_documents' finally block and must not mask the
+    original error.
+
+    Args:
+        db_url (str): Database URL.
+
+    Returns:
+        None
+    """
+    with psycopg.connect(to_psycopg_url(db_url), autocommit=True) as conn:
+        column_type = conn.execute(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'"
+        ).fetchone()[0]
+        if not column_type.startswith("halfvec("):
+            logger.error(
+                f"Embedding column is {column_type}, not halfvec; skipping vector index creation. "
+                "Fix the ingestion error and rerun ingestion to rebuild the index."
+            )
+            return
+
+        row = conn.execute("SELECT vector_dims(embedding) FROM langchain_pg_embedding LIMIT 1").fetchone()
+        if not row:
+            logger.warning("No embeddings stored; skipping vector index creation.")
+            return
+
+        logger.info(f"Building vector index '{VECTOR_INDEX_NAME}'...")
+        conn.execute("SET maintenance_work_mem = '2GB'")
+        conn.execute("SET max_parallel_maintenance_workers = 4")
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX_NAME} ON langchain_pg_embedding "
+            "USING hnsw (embedding halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        )
+        logger.info("Vector index created successfully.")
 
 
 def ingest_pdf():
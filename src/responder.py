@@ -1,31 +1,34 @@
+from typing import AsyncIterator, Callable, List, Optional, Tuple
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
 from loguru import logger
 
-PROMPT_TEMPLATE = """
+NO_INFORMATION_ANSWER = "Não tenho informações necessárias para responder sua pergunta."
+
+PROMPT_TEMPLATE = f"""
 CONTEXTO:
-{contexto}
+{{contexto}}
 
 REGRAS:
 - Responda somente com base no CONTEXTO.
 - Se a informação não estiver explicitamente no CONTEXTO, responda:
-  "Não tenho informações necessárias para responder sua pergunta."
+  "{NO_INFORMATION_ANSWER}"
 - Nunca invente ou use conhecimento externo.
 - Nunca produza opiniões ou interpretações além do que está escrito.
 
 EXEMPLOS DE PERGUNTAS FORA DO CONTEXTO:
 Pergunta: "Qual é a capital da França?"
-Resposta: "Não tenho informações necessárias para responder sua pergunta."
+Resposta: "{NO_INFORMATION_ANSWER}"
 
 Pergunta: "Quantos clientes temos em 2024?"
-Resposta: "Não tenho informações necessárias para responder sua pergunta."
+Resposta: "{NO_INFORMATION_ANSWER}"
 
 Pergunta: "Você acha isso bom ou ruim?"
-Resposta: "Não tenho informações necessárias para responder sua pergunta."
+Resposta: "{NO_INFORMATION_ANSWER}"
 
 PERGUNTA DO USUÁRIO:
-{pergunta}
+{{pergunta}}
 
 RESPONDA A "PERGUNTA DO USUÁRIO"
 """
@@ -39,10 +42,36 @@ class ContextualLLMResponder:
         )
        
 
-    def generate_answer(self, context: str, question: str) -> str:
+    async def astream_answer(self, context: str, question: str) -> AsyncIterator[str]:
+        sequence = self.prompt | self.llm
+        async for chunk in sequence.astream({"contexto": context, "pergunta": question}):
+            if chunk.content:
+                yield chunk.content
+
+    async def agenerate_answer(
+        self, context: str, question: str, on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
         try:
-            sequence = self.prompt | self.llm
-            result = sequence.invoke({"contexto": context, "pergunta": question})
-            return result.content.strip()
+            parts = []
+            async for token in self.astream_answer(context, question):
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+            return "".join(parts).strip()
         except Exception as e:
             logger.exception(f"Erro ao gerar resposta: {e}")
+
+    async def agenerate_answers(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+        sequence = self.prompt | self.llm
+        results = await sequence.abatch(
+            [{"contexto": context, "pergunta": question} for context, question in items],
+            return_exceptions=True,
+        )
+        answers = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Erro ao gerar resposta: {result}")
+                answers.append(None)
+            else:
+                answers.append(result.content.strip())
+        return answers
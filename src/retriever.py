@@ -1,8 +1,73 @@
-from typing import List, Tuple
+import asyncio
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import tiktoken
 from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
 from langchain_postgres import PGVector
 from loguru import logger
+from embeddings import get_embeddings
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+HNSW_EF_SEARCH = 40
+HNSW_ITERATIVE_SCAN = "strict_order"
+QUERY_WORK_MEM = "64MB"
+MMR_FETCH_K = 30
+MMR_LAMBDA = 0.5
+CONTEXT_TOKEN_BUDGET = 3000
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+@lru_cache(maxsize=None)
+def get_engine(connection_url: str) -> Engine:
+    """
+    Retorna um engine SQLAlchemy com pool de conexões, compartilhado por URL.
+
+    Todos os retrievers apontando para o mesmo banco reutilizam as mesmas conexões,
+    evitando criar um engine e refazer o handshake a cada instância.
+
+    Args:
+        connection_url (str): URL de conexão PostgreSQL.
+
+    Returns:
+        Engine: Engine SQLAlchemy configurado com pool.
+    """
+    return create_engine(connection_url, pool_size=10, max_overflow=20, pool_pre_ping=True)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: Optional[str]) -> tiktoken.Encoding:
+    """
+    Retorna o tokenizador do modelo informado, usando o o200k_base para modelos não informados
+    ou desconhecidos.
+
+    Args:
+        model (Optional[str]): Nome do modelo de chat da OpenAI.
+
+    Returns:
+        tiktoken.Encoding: Tokenizador usado para medir o contexto.
+    """
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+    return tiktoken.get_encoding("o200k_base")
+
+
+def truncate_at_sentence(text: str) -> str:
+    """Corta o texto no fim da última frase completa; se não houver nenhuma, mantém o texto."""
+    ends = [m.end() for m in SENTENCE_END.finditer(text)]
+    return text[:ends[-1]] if ends else text
+
+
+def describe_source(doc: Document) -> str:
+    """Descreve a origem de um documento (página do PDF) para a lista de fontes."""
+    page = doc.metadata.get("page_label")
+    if page is None and isinstance(doc.metadata.get("page"), int):
+        page = doc.metadata["page"] + 1
+    return f"página {page}" if page is not None else "origem desconhecida"
 
 
 class DocumentRetriever:
@@ -12,6 +77,14 @@ class DocumentRetriever:
         """Recupera uma lista de documentos relevantes."""
         raise NotImplementedError
 
+    async def aretrieve_context(self, question: str, k: int = 10) -> str:
+        """Recupera, de forma assíncrona, o contexto textual para uma pergunta."""
+        raise NotImplementedError
+
+    async def aretrieve_contexts(self, questions: List[str], k: int = 10) -> List[str]:
+        """Recupera, de forma assíncrona, o contexto textual de várias perguntas."""
+        raise NotImplementedError
+
 
 class PostgresVectorRetriever(DocumentRetriever):
     """
@@ -21,6 +94,17 @@ class PostgresVectorRetriever(DocumentRetriever):
         collection_name (str): Nome da coleção de vetores no banco.
         connection_url (str): URL de conexão PostgreSQL.
         embedding_model (str): Modelo de embedding OpenAI (padrão: text-embedding-3-small).
+        ef_search (int): Tamanho da lista de candidatos do HNSW por consulta; valores menores
+            reduzem a latência e valores maiores aumentam o recall (padrão: 40). Com a varredura
+            iterativa, é só o tamanho de cada rodada: a busca continua até obter `fetch_k`
+            linhas da coleção.
+        work_mem (str): Memória de trabalho do Postgres por consulta (padrão: 64MB).
+        fetch_k (int): Candidatos buscados por similaridade antes do rerank MMR (padrão: 30).
+        mmr_lambda (float): Peso da relevância frente à diversidade no MMR; 1.0 equivale à
+            busca por similaridade pura (padrão: 0.5).
+        context_token_budget (int): Máximo de tokens de conteúdo no contexto (padrão: 3000).
+        tokenizer_model (str, opcional): Modelo de chat cujo tokenizador mede o contexto; deve ser
+            o mesmo modelo que recebe o contexto (padrão: tokenizador o200k_base).
     """
 
     def __init__(
@@ -28,23 +112,59 @@ class PostgresVectorRetriever(DocumentRetriever):
         collection_name: str,
         connection_url: str,
         embedding_model: str = "text-embedding-3-small",
+        ef_search: int = HNSW_EF_SEARCH,
+        work_mem: str = QUERY_WORK_MEM,
+        fetch_k: int = MMR_FETCH_K,
+        mmr_lambda: float = MMR_LAMBDA,
+        context_token_budget: int = CONTEXT_TOKEN_BUDGET,
+        tokenizer_model: Optional[str] = None,
     ) -> None:
         if not collection_name or not connection_url:
             raise ValueError(
                 "Os parâmetros 'collection_name' e 'connection_url' devem ser fornecidos."
             )
 
+        self.ef_search = int(ef_search)
+        self.work_mem = work_mem
+        self.fetch_k = fetch_k
+        self.mmr_lambda = mmr_lambda
+        self.context_token_budget = context_token_budget
+        self.tokenizer_model = tokenizer_model
         self.store = PGVector(
-            embeddings=OpenAIEmbeddings(model=embedding_model),
+            embeddings=get_embeddings(embedding_model),
             collection_name=collection_name,
-            connection=connection_url,
+            connection=get_engine(connection_url),
             use_jsonb=True,
         )
+        event.listen(self.store.session_maker, "after_begin", self._set_search_params)
+
+    def _set_search_params(self, session, transaction, connection) -> None:
+        """
+        Ajusta os parâmetros de busca apenas para a transação corrente (equivalente a SET LOCAL).
+
+        Sozinho, o HNSW devolve no máximo `ef_search` candidatos, e o filtro por `collection_id`
+        na tabela compartilhada é aplicado depois do índice, então o MMR podia receber menos de
+        `fetch_k` (ou até menos de `k`) linhas. Com `hnsw.iterative_scan` (pgvector >= 0.8) o
+        índice continua a varredura até satisfazer o LIMIT, independentemente de `fetch_k` e do
+        filtro; `strict_order` mantém os resultados ordenados pela distância.
+        """
+        connection.execute(
+            text(
+                "SELECT set_config('hnsw.ef_search', :ef_search, true), "
+                "set_config('hnsw.iterative_scan', :iterative_scan, true), "
+                "set_config('work_mem', :work_mem, true)"
+            ),
+            {"ef_search": str(self.ef_search), "iterative_scan": HNSW_ITERATIVE_SCAN, "work_mem": self.work_mem},
+        )
 
     def retrieve(self, question: str, k: int = 10) -> List[Tuple[Document, float]]:
         """
         Busca os k documentos mais semelhantes à pergunta informada.
 
+        Os `fetch_k` candidatos mais próximos são reordenados com Maximal Marginal Relevance,
+        calculado de forma vetorizada em NumPy sobre os embeddings retornados pelo banco, o que
+        descarta trechos redundantes e diversifica o contexto enviado ao LLM.
+
         Args:
             question (str): Pergunta ou texto de consulta.
             k (int): Número de documentos a recuperar (padrão: 3).
@@ -58,7 +178,28 @@ class PostgresVectorRetriever(DocumentRetriever):
         logger.info(f"Buscando informações para a pergunta: '{question}'")
 
         try:
-            return self.store.similarity_search_with_score(question, k=k)
+            return self.store.max_marginal_relevance_search_with_score(
+                question, k=k, fetch_k=max(self.fetch_k, k), lambda_mult=self.mmr_lambda
+            )
+        except Exception:
+            logger.exception("Erro ao recuperar documentos do banco vetorial")
+            return []
+
+    def retrieve_by_vector(self, embedding: List[float], k: int = 10) -> List[Tuple[Document, float]]:
+        """
+        Busca os k documentos mais semelhantes a um embedding já calculado.
+
+        Args:
+            embedding (List[float]): Embedding da consulta.
+            k (int): Número de documentos a recuperar (padrão: 10).
+
+        Returns:
+            List[Tuple[Document, float]]: Lista de tuplas (documento, score).
+        """
+        try:
+            return self.store.max_marginal_relevance_search_with_score_by_vector(
+                embedding, k=k, fetch_k=max(self.fetch_k, k), lambda_mult=self.mmr_lambda
+            )
         except Exception:
             logger.exception("Erro ao recuperar documentos do banco vetorial")
             return []
@@ -67,6 +208,10 @@ class PostgresVectorRetriever(DocumentRetriever):
         """
         Retorna um texto consolidado com o conteúdo dos documentos mais relevantes.
 
+        Os documentos são incluídos em ordem até atingir `context_token_budget` tokens; o que
+        ultrapassa o limite é cortado no fim de uma frase e os documentos restantes aparecem
+        apenas em uma lista de fontes, reduzindo o custo e a latência da chamada ao LLM.
+
         Args:
             question (str): Pergunta ou texto de consulta.
             k (int): Número de documentos a considerar (padrão: 3).
@@ -79,8 +224,79 @@ class PostgresVectorRetriever(DocumentRetriever):
             logger.warning("Nenhum documento encontrado para a consulta.")
             return ""
 
-        context_parts = [
-            f"[Documento {i+1}] {doc.page_content.strip()}"
-            for i, (doc, _) in enumerate(results)
-        ]
+        return self.pack_context(results)
+
+    def pack_context(self, results: List[Tuple[Document, float]]) -> str:
+        """
+        Empacota os documentos recuperados no orçamento de tokens do contexto.
+
+        Args:
+            results (List[Tuple[Document, float]]): Documentos recuperados, em ordem de relevância.
+
+        Returns:
+            str: Contexto textual com os documentos que couberam e a lista das demais fontes.
+        """
+        encoding = get_encoding(self.tokenizer_model)
+        remaining = self.context_token_budget
+        context_parts, omitted_sources = [], []
+
+        for i, (doc, _) in enumerate(results):
+            label = f"[Documento {i+1}]"
+            if remaining <= 0:
+                omitted_sources.append(f"{label} {describe_source(doc)}")
+                continue
+
+            content = doc.page_content.strip()
+            tokens = encoding.encode(content)
+            if len(tokens) > remaining:
+                content = truncate_at_sentence(encoding.decode(tokens[:remaining]))
+                remaining = 0
+            else:
+                remaining -= len(tokens)
+
+            if content:
+                context_parts.append(f"{label} {content}")
+            else:
+                omitted_sources.append(f"{label} {describe_source(doc)}")
+
+        if omitted_sources:
+            logger.info(f"{len(omitted_sources)} documento(s) fora do limite de {self.context_token_budget} tokens.")
+            context_parts.append("Fontes não incluídas por limite de tamanho:\n" + "\n".join(omitted_sources))
         return "\n\n".join(context_parts)
+
+    async def aretrieve_context(self, question: str, k: int = 10) -> str:
+        """
+        Versão assíncrona de `retrieve_context`.
+
+        A consulta ao banco roda em uma thread, permitindo disparar várias buscas
+        concorrentemente (ex.: expansão de consultas) com `asyncio.gather`.
+
+        Args:
+            question (str): Pergunta ou texto de consulta.
+            k (int): Número de documentos a considerar (padrão: 10).
+
+        Returns:
+            str: Contexto textual concatenado dos documentos recuperados.
+        """
+        return await asyncio.to_thread(self.retrieve_context, question, k)
+
+    async def aretrieve_contexts(self, questions: List[str], k: int = 10) -> List[str]:
+        """
+        Recupera o contexto de várias perguntas de uma vez.
+
+        Todas as perguntas são vetorizadas em uma única requisição à OpenAI e as buscas no
+        banco são disparadas concorrentemente com `asyncio.gather`.
+
+        Args:
+            questions (List[str]): Perguntas ou textos de consulta.
+            k (int): Número de documentos a considerar por pergunta (padrão: 10).
+
+        Returns:
+            List[str]: Contexto de cada pergunta, na mesma ordem; vazio quando nada foi encontrado.
+        """
+        logger.info(f"Buscando informações para {len(questions)} perguntas em lote.")
+        embeddings = await asyncio.to_thread(self.store.embeddings.embed_documents, questions)
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.retrieve_by_vector, embedding, k) for embedding in embeddings)
+        )
+        return [self.pack_context(r) if r else "" for r in results]
@@ -1,10 +1,40 @@
+from __future__ import annotations
+
+import asyncio
 import os
-from retriever import DocumentRetriever, PostgresVectorRetriever
-from responder import ContextualLLMResponder
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, List, Optional, TypeVar
 from loguru import logger
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    # Importados apenas para tipagem: retriever e responder carregam LangChain, SQLAlchemy e
+    # psycopg, e só são importados de fato na primeira chamada a build_rag_chain.
+    from retriever import DocumentRetriever
+    from responder import ContextualLLMResponder
+
 load_dotenv()
+
+# Entradas que nunca dependem do documento (saudações, agradecimentos) e são respondidas sem RAG.
+TRIVIAL_INPUT = re.compile(
+    r"^(oi+|ol[aá]|opa|e a[ií]|bom dia|boa tarde|boa noite|obrigad[oa]|valeu|tchau|ok|hello|hi|thanks?)[\s!.?,]*$"
+)
+MIN_QUESTION_LENGTH = 4
+ANSWER_CACHE_SIZE = 1024
+EMPTY_QUESTION_ANSWER = "Por favor, forneça uma pergunta válida."
+NO_CONTEXT_ANSWER = "Não encontrei informações suficientes para responder sua pergunta."
+PROCESSING_ERROR_ANSWER = "Não foi possível processar a pergunta no momento."
+
+T = TypeVar("T")
+
+
+def normalize_question(question: str) -> str:
+    """Normaliza a pergunta (minúsculas, espaços colapsados) para uso como chave de cache."""
+    return " ".join(question.lower().split())
+
+
 # ----------------- RAG Chain -----------------
 class QuestionAnsweringChain:
     """
@@ -14,42 +44,158 @@ class QuestionAnsweringChain:
     Args:
         retriever (DocumentRetriever): Objeto responsável por buscar documentos relevantes.
         responder (ContextualLLMResponder): Objeto LLM que gera respostas baseadas no contexto.
+        cache_size (int): Quantidade de respostas mantidas em cache LRU (padrão: 1024).
     """
 
-    def __init__(self, retriever: DocumentRetriever, responder: ContextualLLMResponder) -> None:
+    def __init__(
+        self,
+        retriever: DocumentRetriever,
+        responder: ContextualLLMResponder,
+        cache_size: int = ANSWER_CACHE_SIZE,
+    ) -> None:
         self.retriever = retriever
         self.responder = responder
+        self.cache_size = cache_size
+        self.answers: "OrderedDict[str, str]" = OrderedDict()
 
-    def answer_question(self, question: str) -> str:
+    def quick_answer(self, key: str) -> Optional[str]:
+        """
+        Retorna uma resposta imediata, sem retriever nem LLM, quando possível.
+
+        Args:
+            key (str): Pergunta normalizada com `normalize_question`.
+
+        Returns:
+            Optional[str]: Resposta padrão para entradas triviais, resposta em cache para
+            perguntas repetidas ou None quando a pergunta precisa passar pelo RAG.
+        """
+        if len(key) < MIN_QUESTION_LENGTH or TRIVIAL_INPUT.match(key):
+            from responder import NO_INFORMATION_ANSWER
+            return NO_INFORMATION_ANSWER
+
+        answer = self.answers.get(key)
+        if answer is not None:
+            self.answers.move_to_end(key)
+        return answer
+
+    def remember(self, key: str, answer: Optional[str]) -> None:
+        """Guarda a resposta gerada pelo LLM no cache LRU, descartando a menos usada."""
+        if not answer:
+            return
+        self.answers[key] = answer
+        self.answers.move_to_end(key)
+        if len(self.answers) > self.cache_size:
+            self.answers.popitem(last=False)
+
+    async def answer_question(
+        self, question: str, on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
         """
         Gera uma resposta para a pergunta informada, utilizando o contexto recuperado do retriever.
 
+        A recuperação e a geração são assíncronas, liberando o loop de eventos enquanto
+        aguardam o banco vetorial e a OpenAI. A resposta do LLM é gerada em streaming e
+        cada trecho é repassado a `on_token` assim que chega. Entradas triviais e perguntas
+        repetidas são respondidas imediatamente (ver `quick_answer`).
+
         Args:
             question (str): Pergunta em linguagem natural.
+            on_token (Callable[[str], None], opcional): Chamado a cada trecho da resposta do LLM.
 
         Returns:
             str: Resposta gerada pelo LLM com base no contexto.
         """
         if not question or not question.strip():
             logger.warning("Pergunta vazia recebida.")
-            return "Por favor, forneça uma pergunta válida."
+            return EMPTY_QUESTION_ANSWER
 
-        context = self.retriever.retrieve_context(question)
+        key = normalize_question(question)
+        answer = self.quick_answer(key)
+        if answer is not None:
+            logger.info("Pergunta respondida sem consultar o RAG (entrada trivial ou em cache).")
+            return answer
+
+        context = await self.retriever.aretrieve_context(question)
         if not context.strip():
             logger.info("Nenhum contexto relevante encontrado para a pergunta.")
-            return "Não encontrei informações suficientes para responder sua pergunta."
+            return NO_CONTEXT_ANSWER
+
+        answer = await self.responder.agenerate_answer(context, question, on_token)
+        if answer is None:
+            return PROCESSING_ERROR_ANSWER
+        self.remember(key, answer)
+        return answer
 
-        return self.responder.generate_answer(context, question)
+    async def answer_questions(self, questions: List[str]) -> List[str]:
+        """
+        Responde várias perguntas em lote.
+
+        Perguntas triviais, repetidas ou em cache são resolvidas sem RAG; as demais são
+        vetorizadas em uma única requisição, têm as buscas executadas concorrentemente e
+        as respostas geradas com uma única chamada em lote ao LLM.
+
+        Args:
+            questions (List[str]): Perguntas em linguagem natural.
+
+        Returns:
+            List[str]: Respostas na mesma ordem das perguntas.
+        """
+        answers: List[Optional[str]] = [None] * len(questions)
+        pending: Dict[str, List[int]] = {}
+        for i, question in enumerate(questions):
+            if not question or not question.strip():
+                answers[i] = EMPTY_QUESTION_ANSWER
+                continue
+            key = normalize_question(question)
+            answer = self.quick_answer(key)
+            if answer is not None:
+                answers[i] = answer
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            keys = list(pending)
+            unique_questions = [questions[pending[key][0]] for key in keys]
+            contexts = await self.retriever.aretrieve_contexts(unique_questions)
+
+            to_generate = []
+            for key, question, context in zip(keys, unique_questions, contexts):
+                if context.strip():
+                    to_generate.append((key, context, question))
+                else:
+                    for i in pending[key]:
+                        answers[i] = NO_CONTEXT_ANSWER
+
+            if to_generate:
+                generated = await self.responder.agenerate_answers(
+                    [(context, question) for _, context, question in to_generate]
+                )
+                for (key, _, _), answer in zip(to_generate, generated):
+                    if answer is None:
+                        answer = PROCESSING_ERROR_ANSWER
+                    else:
+                        self.remember(key, answer)
+                    for i in pending[key]:
+                        answers[i] = answer
+
+        return answers
 
 
 # ----------------- Helper para construir o RAG -----------------
+@lru_cache(maxsize=1)
 def build_rag_chain() -> QuestionAnsweringChain:
     """
     Cria e retorna uma cadeia RAG configurada com PostgresVectorRetriever e ContextualLLMResponder.
 
+    A cadeia é construída uma única vez e reutilizada entre as perguntas, evitando recriar
+    o engine do banco e os clientes da OpenAI a cada chamada.
+
     Returns:
         QuestionAnsweringChain: Cadeia pronta para uso no fluxo de perguntas e respostas.
     """
+    from retriever import PostgresVectorRetriever
+    from responder import ContextualLLMResponder
+
     collection_name = os.getenv("PG_VECTOR_COLLECTION_NAME")
     connection_url = os.getenv("DATABASE_URL")
     embedding_model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
@@ -59,30 +205,132 @@ def build_rag_chain() -> QuestionAnsweringChain:
             "As variáveis de ambiente PG_VECTOR_COLLECTION_NAME e DATABASE_URL devem estar definidas."
         )
 
+    responder = ContextualLLMResponder()
     retriever = PostgresVectorRetriever(
         collection_name=collection_name,
         connection_url=connection_url,
         embedding_model=embedding_model,
+        tokenizer_model=responder.llm.model_name,
     )
-    responder = ContextualLLMResponder()
     return QuestionAnsweringChain(retriever, responder)
 
 
+@lru_cache(maxsize=1)
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Retorna o loop de eventos usado para executar a cadeia RAG.
+
+    O mesmo loop é reaproveitado entre as perguntas, pois os clientes assíncronos da
+    OpenAI mantêm conexões vinculadas ao loop em que foram abertas.
+
+    Returns:
+        asyncio.AbstractEventLoop: Loop de eventos persistente.
+    """
+    return asyncio.new_event_loop()
+
+
+def run_in_chain_loop(coroutine: Coroutine[Any, Any, T], async_name: str) -> T:
+    """
+    Executa a corrotina no loop persistente de `get_event_loop`.
+
+    Um loop não pode ser executado dentro de outro; chamadas feitas a partir de código
+    assíncrono falhariam com um erro genérico, então são recusadas com uma mensagem que
+    indica a versão assíncrona a ser aguardada.
+
+    Args:
+        coroutine (Coroutine): Corrotina a executar.
+        async_name (str): Nome da função assíncrona equivalente, citado no erro.
+
+    Returns:
+        T: Resultado da corrotina.
+
+    Raises:
+        RuntimeError: Se já houver um loop de eventos em execução nesta thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return get_event_loop().run_until_complete(coroutine)
+    coroutine.close()
+    raise RuntimeError(
+        f"Chamada síncrona feita dentro de um loop de eventos em execução; use `await {async_name}(...)`."
+    )
+
+
 # ----------------- Função Principal Exposta -----------------
-def search_prompt(question: str) -> str:
+async def asearch_prompt(question: str, on_token: Optional[Callable[[str], None]] = None) -> str:
     """
-    Função principal para ser usada externamente (ex: API, chatbot).
-    Recebe a pergunta e retorna a resposta gerada via RAG.
+    Versão assíncrona de `search_prompt`, para chamadores que já executam um loop de eventos.
+
+    Os clientes da OpenAI ficam vinculados ao primeiro loop que os usa, então um mesmo
+    processo deve usar só a versão síncrona ou só a assíncrona.
 
     Args:
         question (str): Pergunta do usuário.
+        on_token (Callable[[str], None], opcional): Recebe os trechos da resposta à medida que
+            são gerados, permitindo exibi-los antes da conclusão.
 
     Returns:
         str: Resposta do modelo baseada em recuperação de contexto.
     """
     try:
         rag_chain = build_rag_chain()
-        return rag_chain.answer_question(question)
+        return await rag_chain.answer_question(question, on_token)
     except Exception:
         logger.exception("Erro ao processar a pergunta via RAG.")
-        return "Não foi possível processar a pergunta no momento."
+        return PROCESSING_ERROR_ANSWER
+
+
+async def asearch_prompts(questions: List[str]) -> List[str]:
+    """
+    Versão assíncrona de `search_prompts` (ver `asearch_prompt`).
+
+    Args:
+        questions (List[str]): Perguntas do usuário.
+
+    Returns:
+        List[str]: Respostas na mesma ordem das perguntas.
+    """
+    try:
+        rag_chain = build_rag_chain()
+        return await rag_chain.answer_questions(questions)
+    except Exception:
+        logger.exception("Erro ao processar as perguntas via RAG.")
+        return [PROCESSING_ERROR_ANSWER] * len(questions)
+
+
+def search_prompt(question: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Função principal para ser usada externamente (ex: API, chatbot).
+    Recebe a pergunta e retorna a resposta gerada via RAG.
+
+    Args:
+        question (str): Pergunta do usuário.
+        on_token (Callable[[str], None], opcional): Recebe os trechos da resposta à medida que
+            são gerados, permitindo exibi-los antes da conclusão.
+
+    Returns:
+        str: Resposta do modelo baseada em recuperação de contexto.
+
+    Raises:
+        RuntimeError: Se chamada dentro de um loop de eventos em execução; nesse caso use
+            `await asearch_prompt(...)`.
+    """
+    return run_in_chain_loop(asearch_prompt(question, on_token), "asearch_prompt")
+
+
+def search_prompts(questions: List[str]) -> List[str]:
+    """
+    Versão em lote de `search_prompt` para várias perguntas de uma vez.
+
+    Args:
+        questions (List[str]): Perguntas do usuário.
+
+    Returns:
+        List[str]: Respostas na mesma ordem das perguntas.
+
+    Raises:
+        RuntimeError: Se chamada dentro de um loop de eventos em execução; nesse caso use
+            `await asearch_prompts(...)`.
+    """
+    return run_in_chain_loop(asearch_prompts(questions), "asearch_prompts")